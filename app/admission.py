@@ -0,0 +1,153 @@
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ordered from highest to lowest precedence
+PRIORITY_CLASSES = ("interactive", "batch")
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being queued."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionTicket:
+    """A request's place in the admission queue; its priority can be raised while it waits."""
+    def __init__(self, client_key: str, priority: str = "interactive"):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class '{priority}'")
+        self.client_key = client_key
+        self.priority = priority
+        self._waiter: Optional[asyncio.Future] = None
+
+class AdmissionController:
+    """
+    Bounds the number of in-flight requests. Waiting requests are served by
+    priority class, and round-robin across client keys within a class so one
+    client cannot monopolise the queue. Requests whose estimated wait exceeds
+    max_queue_wait are rejected up front rather than left to time out.
+    """
+    def __init__(self, max_in_flight: int, max_queue_wait: float, max_queue_size: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.max_queue_size = max_queue_size
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._queued = 0
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITY_CLASSES}
+        self._avg_service_time: Optional[float] = None
+
+    def _estimate_wait(self, priority: str) -> Optional[float]:
+        if self._avg_service_time is None:
+            return None
+        ahead = 0
+        for p in PRIORITY_CLASSES:
+            ahead += sum(len(waiters) for waiters in self._queues[p].values())
+            if p == priority:
+                break
+        return (ahead + 1) * self._avg_service_time / self.max_in_flight
+
+    def _record_service_time(self, elapsed: float):
+        if self._avg_service_time is None:
+            self._avg_service_time = elapsed
+        else:
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+
+    def _reject(self, estimated_wait: Optional[float]) -> AdmissionRejected:
+        self.rejected += 1
+        retry_after = max(1, math.ceil(estimated_wait if estimated_wait is not None else self.max_queue_wait))
+        logger.info(f"Shedding request: {self.in_flight} in flight, {self._queued} queued, retry after {retry_after}s")
+        return AdmissionRejected(retry_after)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in PRIORITY_CLASSES:
+            queues = self._queues[priority]
+            while queues:
+                client_key, waiters = next(iter(queues.items()))
+                waiter = waiters.popleft()
+                self._queued -= 1
+                if waiters:
+                    queues.move_to_end(client_key)
+                else:
+                    del queues[client_key]
+                if not waiter.done():
+                    return waiter
+        return None
+
+    def _remove_waiter(self, priority: str, client_key: str, waiter: asyncio.Future):
+        waiters = self._queues[priority].get(client_key)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued -= 1
+            if not waiters:
+                del self._queues[priority][client_key]
+
+    def _enqueue(self, ticket: AdmissionTicket):
+        self._queues[ticket.priority].setdefault(ticket.client_key, deque()).append(ticket._waiter)
+        self._queued += 1
+
+    async def _acquire(self, ticket: AdmissionTicket):
+        if self.in_flight < self.max_in_flight and self._queued == 0:
+            self.in_flight += 1
+            return
+
+        estimated_wait = self._estimate_wait(ticket.priority)
+        if self._queued >= self.max_queue_size or (estimated_wait is not None and estimated_wait > self.max_queue_wait):
+            raise self._reject(estimated_wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        ticket._waiter = waiter
+        self._enqueue(ticket)
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_queue_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up, so pass it on
+                self._release()
+            else:
+                self._remove_waiter(ticket.priority, ticket.client_key, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(self._estimate_wait(ticket.priority))
+            raise
+        finally:
+            ticket._waiter = None
+
+    def promote(self, ticket: AdmissionTicket, priority: str):
+        """Raises a ticket to a higher priority class, moving it between queues if it is waiting."""
+        if PRIORITY_CLASSES.index(priority) >= PRIORITY_CLASSES.index(ticket.priority):
+            return
+        waiter = ticket._waiter
+        if waiter is not None and not waiter.done():
+            self._remove_waiter(ticket.priority, ticket.client_key, waiter)
+            ticket.priority = priority
+            self._enqueue(ticket)
+        else:
+            ticket.priority = priority
+
+    def _release(self):
+        waiter = self._next_waiter()
+        if waiter is not None:
+            # Hand the slot straight to the next waiter; in_flight is unchanged
+            waiter.set_result(None)
+        else:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, ticket: AdmissionTicket):
+        await self._acquire(ticket)
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record_service_time(time.monotonic() - start)
+            self._release()
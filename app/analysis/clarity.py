@@ -0,0 +1,58 @@
+import os
+import sys
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+import joblib
+import numpy as np
+from typing import List
+from sklearn.linear_model import LogisticRegression
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingClarityScorer:
+    """Scores clarity from the response embeddings the Evaluator already computes."""
+    _head = None
+
+    @classmethod
+    def load(cls):
+        """Loads the trained head if it hasn't been loaded yet."""
+        if cls._head is None:
+            if not os.path.exists(config.CLARITY_HEAD_PATH):
+                raise FileNotFoundError(
+                    f"Clarity head not found at '{config.CLARITY_HEAD_PATH}'. "
+                    "Train one with scripts/train_clarity_head.py or set CLARITY_SCORER=sentiment."
+                )
+            logger.info(f"Loading clarity head: {config.CLARITY_HEAD_PATH}")
+            cls._head = joblib.load(config.CLARITY_HEAD_PATH)
+            logger.info("Clarity head loaded")
+
+    @classmethod
+    def score_embeddings(cls, embeddings: List[np.ndarray]) -> List[float]:
+        """Returns a clarity score (0.0 to 1.0) per embedding, in the same order."""
+        if not embeddings:
+            return []
+
+        cls.load()
+        probabilities = cls._head.predict_proba(np.vstack(embeddings))[:, 1]
+        return [float(p) for p in probabilities]
+
+    @staticmethod
+    def train(embeddings: np.ndarray, soft_labels: np.ndarray) -> LogisticRegression:
+        """
+        Distils a logistic regression head from soft teacher labels.
+        Each sample is added once as positive and once as negative, weighted by
+        the teacher's probability, so the head learns the full score rather
+        than a thresholded label.
+        """
+        soft_labels = np.clip(soft_labels, 0.0, 1.0)
+        features = np.vstack([embeddings, embeddings])
+        targets = np.concatenate([np.ones(len(embeddings)), np.zeros(len(embeddings))])
+        weights = np.concatenate([soft_labels, 1.0 - soft_labels])
+
+        head = LogisticRegression(max_iter=1000)
+        head.fit(features, targets, sample_weight=weights)
+        return head
@@ -11,7 +11,6 @@ from scipy.spatial.distance import cosine
 from app.utils.embeddings import Embeddings
 from app.providers.llm_providers import LLMResponse
 from app.analysis.evidence import EvidenceRetriever
-from app.analysis.sentiment import SentimentAnalyzer
 import config
 
 logger = logging.getLogger(__name__)
@@ -20,7 +19,16 @@ class Evaluator:
     def __init__(self):
         self.embeddings_service = Embeddings()
         self.evidence_retriever = EvidenceRetriever()
-        self.sentiment_analyzer = SentimentAnalyzer()
+        # Only import the scorer that is selected so DistilBERT is never loaded for "embedding"
+        if config.CLARITY_SCORER == "embedding":
+            from app.analysis.clarity import EmbeddingClarityScorer
+            self.clarity_scorer = EmbeddingClarityScorer()
+            self.clarity_scorer.load()
+            self.sentiment_analyzer = None
+        else:
+            from app.analysis.sentiment import SentimentAnalyzer
+            self.clarity_scorer = None
+            self.sentiment_analyzer = SentimentAnalyzer()
         logger.info("Evaluator initialized")
 
     def _calculate_consensus_score(self, target_embedding: np.ndarray, all_embeddings: List[np.ndarray]) -> float:
@@ -47,6 +55,9 @@ class Evaluator:
         response_embeddings_raw = self.embeddings_service.get_sentence_embeddings(response_texts)
         all_embeddings = [np.array(e) for e in response_embeddings_raw if e]
 
+        if self.clarity_scorer is not None:
+            clarity_scores = self.clarity_scorer.score_embeddings(all_embeddings)
+
         scored_candidates = []
         for i, response in enumerate(llm_responses):
             logger.debug(f"Scoring candidate {i+1}: {response.provider_name}")
@@ -54,14 +65,11 @@ class Evaluator:
             # CRITICAL FIX: Check evidence for the RESPONSE, not the prompt
             evidence_snippets, evidence_score = self.evidence_retriever.get_evidence_and_score(response.text)
             
-            # Analyze sentiment/clarity
-            sentiment_result = self.sentiment_analyzer.analyze_sentiment(response.text)
-            if sentiment_result['label'] == 'POSITIVE':
-                clarity_score = sentiment_result['score']
-            elif sentiment_result['label'] == 'NEGATIVE':
-                clarity_score = 1.0 - sentiment_result['score']
+            # Analyze clarity
+            if self.clarity_scorer is not None:
+                clarity_score = clarity_scores[i]
             else:
-                clarity_score = 0.5
+                clarity_score = self.sentiment_analyzer.clarity_score(response.text)
 
             # Calculate consensus
             target_embedding = all_embeddings[i]
@@ -52,6 +52,16 @@ class SentimentAnalyzer:
                 print(f"[SENTIMENT DEBUG] Error during sentiment analysis for '{text[:50]}...': {e}")
             return {"label": "ERROR", "score": 0.0}
 
+    @classmethod
+    def clarity_score(cls, text: str) -> float:
+        """Maps the sentiment result onto a 0.0 to 1.0 clarity score."""
+        sentiment_result = cls.analyze_sentiment(text)
+        if sentiment_result['label'] == 'POSITIVE':
+            return sentiment_result['score']
+        elif sentiment_result['label'] == 'NEGATIVE':
+            return 1.0 - sentiment_result['score']
+        return 0.5
+
 # Example usage (for testing)
 if __name__ == "__main__":
     print("Running SentimentAnalyzer test...")
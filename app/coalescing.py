@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses whitespace and case so trivially different prompts share a key."""
+    return " ".join(prompt.split()).casefold()
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its result was ready."""
+
+class _Call:
+    def __init__(self, task: asyncio.Task, context: Any):
+        self.task = task
+        self.context = context
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one running task; every
+    waiter receives its result or exception. Nothing is cached once the task
+    finishes. The shared task is cancelled only when all of its waiters have
+    been cancelled.
+    """
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        context: Any = None,
+        on_join: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """
+        Awaits the in-flight call for key, starting fn() if there is none.
+        context is kept with a new call; when this caller joins an existing
+        call instead, on_join receives that call's context.
+        """
+        call = self._calls.get(key)
+        if call is None or call.task.done():
+            call = _Call(asyncio.ensure_future(fn()), context)
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._calls[key] = call
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Coalesced request onto in-flight aggregation ({call.waiters} already waiting)")
+            if on_join is not None:
+                on_join(call.context)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every waiter has gone, so nobody needs the result any more
+                self.abandoned += 1
+                self._forget(key, call)
+                call.task.cancel()
+
+async def cancel_on_disconnect(
+    awaitable: Awaitable[Any],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: float
+) -> Any:
+    """
+    Awaits the result while polling is_disconnected. The server does not cancel
+    a handler when its client goes away, so this cancels the wait itself and
+    raises ClientDisconnected.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,136 @@
+import io
+import gzip
+import json
+import zlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import select, text
+
+from app.database import engine
+from app.models import QueryHistory
+
+logger = logging.getLogger(__name__)
+
+history_table = QueryHistory.__table__
+
+def _iter_row_batches(batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Streams the history table with a server-side cursor, without building ORM objects."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            select(history_table).order_by(history_table.c.id)
+        )
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+def stream_ndjson_gzip(batch_size: int) -> Iterator[bytes]:
+    """Yields a gzip-compressed NDJSON dump of the history table, one batch at a time."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for rows in _iter_row_batches(batch_size):
+        lines = []
+        for row in rows:
+            row["timestamp"] = row["timestamp"].isoformat()
+            lines.append(json.dumps(row) + "\n")
+        chunk = compressor.compress("".join(lines).encode("utf-8"))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands back whatever has been written since the last drain."""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_parquet(batch_size: int) -> Iterator[bytes]:
+    """Yields a gzip-compressed Parquet dump of the history table, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("prompt", pa.string()),
+        ("winning_provider", pa.string()),
+        ("winning_text", pa.string()),
+        ("final_score", pa.float64()),
+        ("evidence_score", pa.float64()),
+        ("consensus_score", pa.float64()),
+        ("sentiment_score", pa.float64()),
+        ("evidence_snippets_json", pa.string()),
+        ("all_candidates_json", pa.string()),
+    ])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="gzip")
+    try:
+        for rows in _iter_row_batches(batch_size):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def _iter_dump_batches(path: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield record_batch.to_pylist()
+        return
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        batch = []
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def import_dump(path: str, batch_size: int, keep_ids: bool = False) -> int:
+    """
+    Loads an NDJSON (optionally gzipped) or Parquet dump into the history table,
+    committing one transaction per batch. Returns the number of rows imported.
+    """
+    total = 0
+    for batch in _iter_dump_batches(path, batch_size):
+        if not keep_ids:
+            for row in batch:
+                row.pop("id", None)
+        with engine.begin() as conn:
+            conn.execute(history_table.insert(), batch)
+        total += len(batch)
+        logger.info(f"Imported {total} rows")
+
+    if keep_ids and engine.dialect.name == "postgresql":
+        # Explicit ids bypass the sequence, so move it past the imported rows
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{history_table.name}', 'id'), "
+                f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {history_table.name}"
+            ))
+    return total
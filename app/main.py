@@ -1,24 +1,31 @@
 import os
 import sys
 import json
+import asyncio
+import secrets
 import logging
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, Response, status
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from typing import Any, Dict, List, Optional
 from sqlmodel import Session, select
 
 import config
 from app.providers.llm_providers import LLMProviders
 from app.analysis.evaluator import Evaluator
 from app.schemas import AskRequest, AggregateResponse
-from app.database import create_db_and_tables, get_session
+from app.database import create_db_and_tables, get_session, engine
 from app.models import QueryHistory
+from app.admission import AdmissionController, AdmissionRejected, AdmissionTicket, PRIORITY_CLASSES
+from app.coalescing import SingleFlight, ClientDisconnected, cancel_on_disconnect, normalize_prompt
+from app.history_io import stream_ndjson_gzip, stream_parquet
+from app.profiling import StackSampler, ProfilerBusy, save_profile, get_profile_path
 
 # Setup logging
 logging.basicConfig(
@@ -34,6 +41,12 @@ async def lifespan(app: FastAPI):
     logger.info("Pre-loading ML models...")
     app.state.llm_provider = LLMProviders()
     app.state.evaluator = Evaluator()
+    app.state.admission = AdmissionController(
+        max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+        max_queue_wait=config.ADMISSION_MAX_QUEUE_WAIT,
+        max_queue_size=config.ADMISSION_MAX_QUEUE_SIZE
+    )
+    app.state.single_flight = SingleFlight()
     logger.info("Application startup complete")
     yield
     logger.info("Application shutdown")
@@ -68,36 +81,130 @@ async def verify_api_key(api_key: str = Depends(api_key_header_auth)):
         )
     
     token = api_key.split(" ")[1]
-    if token != config.AGGREGATOR_TOKEN:
+    if token != config.AGGREGATOR_TOKEN and not (config.AGGREGATOR_BATCH_TOKEN and token == config.AGGREGATOR_BATCH_TOKEN):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API Key"
         )
     return token
 
+def resolve_priority(token: str, requested: Optional[str]) -> str:
+    """
+    The credential sets the highest class a caller may use: the batch token is
+    always "batch". X-Priority can only lower a request's class, never raise it.
+    """
+    ceiling = "batch" if config.AGGREGATOR_BATCH_TOKEN and token == config.AGGREGATOR_BATCH_TOKEN else "interactive"
+    if requested is None:
+        return ceiling
+    if requested not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of: {', '.join(PRIORITY_CLASSES)}")
+    return max(requested, ceiling, key=PRIORITY_CLASSES.index)
+
+def resolve_client_key(raw_request: Request, client_id: Optional[str]) -> str:
+    """
+    Fair queuing key: the remote address, which the caller cannot choose.
+    X-Client-Id is only honoured when a trusted gateway sets it.
+    """
+    if client_id and config.ADMISSION_TRUST_CLIENT_ID:
+        return f"id:{client_id}"
+    return f"addr:{raw_request.client.host if raw_request.client else 'unknown'}"
+
 @app.get("/", tags=["Health"])
 async def read_root():
     return {"status": "LLMASSEMBLE API is running"}
 
 @app.post("/api/aggregate", 
           response_model=AggregateResponse, 
-          tags=["Aggregation"],
-          dependencies=[Depends(verify_api_key)])
+          tags=["Aggregation"])
 async def aggregate_and_evaluate(
     request: AskRequest, 
-    session: Session = Depends(get_session)
+    raw_request: Request,
+    response: Response,
+    token: str = Depends(verify_api_key),
+    x_priority: Optional[str] = Header(None),
+    x_client_id: Optional[str] = Header(None),
+    x_profile: Optional[str] = Header(None)
 ) -> AggregateResponse:
     if not request.prompt or not request.prompt.strip():
         raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+    priority = resolve_priority(token, x_priority)
+    ticket = AdmissionTicket(resolve_client_key(raw_request, x_client_id), priority)
 
     logger.info(f"New request: {request.prompt[:50]}...")
 
-    llm_responses = await app.state.llm_provider.get_all_llm_responses(request.prompt)
+    try:
+        if x_profile and config.PROFILING_ENABLED:
+            if not is_profiling_token(x_profile):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid profiling token")
+            # Profiled requests skip coalescing so the profile id goes back to the caller that asked.
+            # The sampler is process-wide: the profile also holds stacks from any concurrent requests.
+            async with app.state.admission.admit(ticket):
+                evaluation_results = await _profiled_aggregate(request.prompt, response)
+        elif config.COALESCE_ENABLED:
+            # The shared call is admitted at the highest priority among its waiters, and
+            # each waiter leaves when its client disconnects so abandoned work gets cancelled
+            evaluation_results = await cancel_on_disconnect(
+                app.state.single_flight.do(
+                    normalize_prompt(request.prompt),
+                    lambda: _admitted_aggregate(request.prompt, ticket),
+                    context=ticket,
+                    on_join=lambda leader_ticket: app.state.admission.promote(leader_ticket, priority)
+                ),
+                raw_request.is_disconnected,
+                config.COALESCE_DISCONNECT_POLL_INTERVAL
+            )
+        else:
+            evaluation_results = await _admitted_aggregate(request.prompt, ticket)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is overloaded, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ClientDisconnected:
+        logger.info("Client disconnected before its aggregation finished")
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+    return AggregateResponse(**evaluation_results, prompt=request.prompt)
+
+async def _admitted_aggregate(prompt: str, ticket: AdmissionTicket) -> Dict[str, Any]:
+    async with app.state.admission.admit(ticket):
+        return await _aggregate(prompt)
+
+async def _profiled_aggregate(prompt: str, response: Response) -> Dict[str, Any]:
+    sampler = StackSampler()
+    try:
+        sampler.start()
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        evaluation_results = await _aggregate(prompt)
+    except BaseException as e:
+        profile_id = _finish_profile(sampler)
+        logger.warning(f"Profiled aggregation failed ({type(e).__name__}), profile id {profile_id}")
+        if isinstance(e, HTTPException):
+            e.headers = {**(e.headers or {}), "X-Profile-Id": profile_id}
+        raise
+
+    response.headers["X-Profile-Id"] = _finish_profile(sampler)
+    return evaluation_results
+
+def _finish_profile(sampler: StackSampler) -> str:
+    sampler.stop()
+    return save_profile(sampler, "aggregate")
+
+async def _aggregate(prompt: str) -> Dict[str, Any]:
+    """
+    Runs the fan-out, evaluation and history save for one prompt. Uses its own
+    session because a coalesced aggregation can outlive the request that started it.
+    """
+    llm_responses = await app.state.llm_provider.get_all_llm_responses(prompt)
     
     if not llm_responses:
         raise HTTPException(status_code=503, detail="No valid responses from LLM providers")
 
-    evaluation_results = await app.state.evaluator.evaluate_responses(request.prompt, llm_responses)
+    evaluation_results = await app.state.evaluator.evaluate_responses(prompt, llm_responses)
     
     winner_data = evaluation_results.get("winner")
     if winner_data:
@@ -106,7 +213,7 @@ async def aggregate_and_evaluate(
             snippets_json = json.dumps(winner_data.get("evidence_snippets", []))
 
             history_record = QueryHistory(
-                prompt=request.prompt,
+                prompt=prompt,
                 winning_provider=winner_data["response"]["provider_name"],
                 winning_text=winner_data["response"]["text"],
                 final_score=winner_data["final_score"],
@@ -116,15 +223,32 @@ async def aggregate_and_evaluate(
                 evidence_snippets_json=snippets_json,
                 all_candidates_json=candidates_json
             )
-            session.add(history_record)
-            session.commit()
-            session.refresh(history_record)
-            logger.info(f"Saved query to history: ID {history_record.id}")
+            with Session(engine) as session:
+                session.add(history_record)
+                session.commit()
+                session.refresh(history_record)
+                logger.info(f"Saved query to history: ID {history_record.id}")
         except Exception as e:
             logger.error(f"Error saving to database: {e}")
 
-    evaluation_results['prompt'] = request.prompt
-    return AggregateResponse(**evaluation_results)
+    return evaluation_results
+
+@app.get("/api/stats", tags=["Health"], dependencies=[Depends(verify_api_key)])
+async def read_stats():
+    admission = app.state.admission
+    single_flight = app.state.single_flight
+    return {
+        "admission": {
+            "in_flight": admission.in_flight,
+            "admitted": admission.admitted,
+            "rejected": admission.rejected
+        },
+        "coalescing": {
+            "leaders": single_flight.leaders,
+            "coalesced": single_flight.coalesced,
+            "abandoned": single_flight.abandoned
+        }
+    }
 
 @app.get("/api/history", response_model=List[QueryHistory], tags=["History"])
 def read_history(
@@ -136,6 +260,23 @@ def read_history(
     results = session.exec(statement).all()
     return results
 
+@app.get("/api/history/export", tags=["History"], dependencies=[Depends(verify_api_key)])
+def export_history(format: str = "ndjson"):
+    if format == "ndjson":
+        content = stream_ndjson_gzip(config.HISTORY_EXPORT_BATCH_SIZE)
+        media_type, filename = "application/gzip", "history.ndjson.gz"
+    elif format == "parquet":
+        content = stream_parquet(config.HISTORY_EXPORT_BATCH_SIZE)
+        media_type, filename = "application/vnd.apache.parquet", "history.parquet"
+    else:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'parquet'")
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.delete("/api/history/{item_id}", tags=["History"])
 def delete_history_item(
     item_id: int,
@@ -150,6 +291,48 @@ def delete_history_item(
     session.commit()
     return {"ok": True}
 
+def is_profiling_token(token: str) -> bool:
+    return bool(config.PROFILING_TOKEN) and secrets.compare_digest(token, config.PROFILING_TOKEN)
+
+async def verify_profiling_token(api_key: str = Depends(api_key_header_auth)):
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not api_key or not api_key.startswith("Bearer ") or not is_profiling_token(api_key.split(" ")[1]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid profiling token"
+        )
+
+@app.post("/api/debug/profile",
+          response_class=PlainTextResponse,
+          tags=["Debug"],
+          dependencies=[Depends(verify_profiling_token)])
+async def profile_worker(seconds: float = 10.0):
+    if not 0 < seconds <= config.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {config.PROFILE_MAX_SECONDS}")
+
+    sampler = StackSampler()
+    try:
+        sampler.start()
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+
+    profile_id = save_profile(sampler, "worker")
+    return PlainTextResponse(sampler.folded(), headers={"X-Profile-Id": profile_id})
+
+@app.get("/api/debug/profiles/{profile_id}",
+         tags=["Debug"],
+         dependencies=[Depends(verify_profiling_token)])
+def download_profile(profile_id: str):
+    path = get_profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=profile_id)
+
 if __name__ == "__main__":
     logger.info("Starting LLMASSEMBLE server at http://127.0.0.1:8000")
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True, app_dir=os.path.dirname(__file__))
\ No newline at end of file
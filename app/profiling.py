@@ -0,0 +1,88 @@
+import os
+import re
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_PATTERN = re.compile(r"^[a-z]+-\d{8}T\d{6}-\d+\.folded$")
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+class StackSampler:
+    """
+    Process-wide sampling profiler that periodically records the stack of
+    every thread (event loop and executor threads alike, including those
+    serving other requests) and aggregates them in the collapsed "folded"
+    format read by flamegraph.pl and speedscope.
+    Only one sampler runs at a time.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, interval: float = config.PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(thread_names.get(ident, f"thread-{ident}"))
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if not StackSampler._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        StackSampler._lock.release()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+def save_profile(sampler: StackSampler, kind: str) -> str:
+    """Writes the folded stacks to PROFILE_DIR and returns the profile id."""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    profile_id = f"{kind}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{time.monotonic_ns()}.folded"
+    with open(os.path.join(config.PROFILE_DIR, profile_id), "w") as f:
+        f.write(sampler.folded())
+    logger.info(f"Saved profile {profile_id} ({sum(sampler.samples.values())} samples)")
+    return profile_id
+
+def get_profile_path(profile_id: str) -> Optional[str]:
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(config.PROFILE_DIR, profile_id)
+    return path if os.path.exists(path) else None
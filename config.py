@@ -10,6 +10,9 @@ if not AGGREGATOR_TOKEN:
     print("ERROR: AGGREGATOR_TOKEN not set in environment variables")
     sys.exit(1)
 
+# Optional second token for batch jobs; requests made with it are always queued as "batch"
+AGGREGATOR_BATCH_TOKEN = os.getenv("AGGREGATOR_BATCH_TOKEN")
+
 # LLM API Keys
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -32,6 +35,15 @@ WEIGHT_EVIDENCE = 0.5
 WEIGHT_CONSENSUS = 0.3
 WEIGHT_CLARITY = 0.2
 
+# Clarity Scorer - "sentiment" runs DistilBERT per candidate, "embedding" runs a
+# small trained head on the MiniLM response embeddings (see scripts/train_clarity_head.py)
+CLARITY_SCORERS = ("sentiment", "embedding")
+CLARITY_SCORER = os.getenv("CLARITY_SCORER", "sentiment").lower()
+if CLARITY_SCORER not in CLARITY_SCORERS:
+    print(f"ERROR: CLARITY_SCORER must be one of {', '.join(CLARITY_SCORERS)}, got '{CLARITY_SCORER}'")
+    sys.exit(1)
+CLARITY_HEAD_PATH = os.getenv("CLARITY_HEAD_PATH", "clarity_head.joblib")
+
 # Wikipedia Settings
 WIKIPEDIA_LANGUAGE = 'en'
 WIKIPEDIA_SUGGESTIONS = 3
@@ -41,5 +53,33 @@ WIKIPEDIA_SENTENCES = 5
 MIN_CLAIMS_FOR_EVIDENCE = 1
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
 
+# History Export - rows fetched per server-side cursor batch
+HISTORY_EXPORT_BATCH_SIZE = 1000
+
+# Admission Control for /api/aggregate
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+if ADMISSION_MAX_IN_FLIGHT < 1:
+    print(f"ERROR: ADMISSION_MAX_IN_FLIGHT must be at least 1, got {ADMISSION_MAX_IN_FLIGHT}")
+    sys.exit(1)
+ADMISSION_MAX_QUEUE_WAIT = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", "10"))
+ADMISSION_MAX_QUEUE_SIZE = int(os.getenv("ADMISSION_MAX_QUEUE_SIZE", "100"))
+# Only for deployments where a trusted gateway sets X-Client-Id; otherwise queues are per remote address
+ADMISSION_TRUST_CLIENT_ID = os.getenv("ADMISSION_TRUST_CLIENT_ID", "False").lower() == "true"
+
+# Request Coalescing - concurrent identical prompts share one aggregation
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "True").lower() == "true"
+COALESCE_DISCONNECT_POLL_INTERVAL = 0.5
+
+# Debug Profiling - per-request (X-Profile header) and live worker sampling
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+# Admin-only token: AGGREGATOR_TOKEN ships in the frontend bundle, so it must not unlock profiling
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+if PROFILING_ENABLED and not PROFILING_TOKEN:
+    print("ERROR: PROFILING_TOKEN must be set when PROFILING_ENABLED is true")
+    sys.exit(1)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 60
+
 # CORS Settings
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
\ No newline at end of file
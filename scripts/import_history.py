@@ -0,0 +1,35 @@
+"""
+Bulk-loads a history dump produced by GET /api/history/export into the
+database configured by DATABASE_URL.
+
+Usage:
+    python scripts/import_history.py history.ndjson.gz [--batch-size 1000] [--keep-ids]
+    python scripts/import_history.py history.parquet
+"""
+import os
+import sys
+import logging
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import create_db_and_tables
+from app.history_io import import_dump
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a history dump in batched transactions.")
+    parser.add_argument("path", help="Dump file (.ndjson, .ndjson.gz or .parquet)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction")
+    parser.add_argument("--keep-ids", action="store_true",
+                        help="Keep the original ids instead of letting the database assign new ones")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    total = import_dump(args.path, args.batch_size, keep_ids=args.keep_ids)
+    logger.info(f"Done: imported {total} rows from {args.path}")
+
+if __name__ == "__main__":
+    main()
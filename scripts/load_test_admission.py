@@ -0,0 +1,97 @@
+"""
+Load-test scenario for the /api/aggregate admission controller.
+
+Simulates a backend whose capacity is shared between concurrent requests
+(so every extra request slows all the others down, like model inference and
+provider calls do), then offers increasing load with and without admission
+control and reports latency percentiles for the requests that were served.
+
+Usage:
+    python scripts/load_test_admission.py [--duration 20] [--capacity 8]
+"""
+import os
+import sys
+import random
+import asyncio
+import logging
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.admission import AdmissionController, AdmissionRejected, AdmissionTicket
+
+class SharedBackend:
+    """Processor-sharing backend: service time stretches once concurrency exceeds capacity."""
+    def __init__(self, capacity: int, base_service_time: float):
+        self.capacity = capacity
+        self.base_service_time = base_service_time
+        self.active = 0
+
+    async def handle(self):
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            remaining = self.base_service_time
+            while remaining > 0:
+                started = loop.time()
+                await asyncio.sleep(0.01)
+                remaining -= (loop.time() - started) * self.capacity / max(self.capacity, self.active)
+        finally:
+            self.active -= 1
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run_scenario(offered_rps: float, duration: float, capacity: int, service_time: float, admission: bool):
+    loop = asyncio.get_running_loop()
+    backend = SharedBackend(capacity, service_time)
+    controller = AdmissionController(max_in_flight=capacity, max_queue_wait=2 * service_time, max_queue_size=100)
+    latencies, rejected = [], 0
+
+    async def client(client_key: str, priority: str):
+        nonlocal rejected
+        start = loop.time()
+        try:
+            if admission:
+                async with controller.admit(AdmissionTicket(client_key, priority)):
+                    await backend.handle()
+            else:
+                await backend.handle()
+            latencies.append(loop.time() - start)
+        except AdmissionRejected:
+            rejected += 1
+
+    tasks = []
+    end = loop.time() + duration
+    while loop.time() < end:
+        priority = "interactive" if random.random() < 0.7 else "batch"
+        tasks.append(asyncio.create_task(client(f"client-{random.randint(0, 4)}", priority)))
+        await asyncio.sleep(random.expovariate(offered_rps))
+    await asyncio.gather(*tasks)
+
+    return latencies, rejected, len(tasks)
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Admission control load test")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of offered load per step")
+    parser.add_argument("--capacity", type=int, default=8, help="Concurrent requests the backend can serve at full speed")
+    parser.add_argument("--service-time", type=float, default=0.5, help="Uncontended request latency in seconds")
+    args = parser.parse_args()
+
+    capacity_rps = args.capacity / args.service_time
+    print(f"Backend capacity ~{capacity_rps:.0f} req/s")
+    print(f"{'load':>6} {'admission':>9} {'served':>7} {'shed':>6} {'p50':>7} {'p99':>7}")
+    for load_factor in (0.5, 1.0, 1.5, 2.0, 3.0):
+        for admission in (False, True):
+            latencies, rejected, total = await run_scenario(
+                capacity_rps * load_factor, args.duration, args.capacity, args.service_time, admission
+            )
+            print(f"{load_factor:>5.1f}x {'on' if admission else 'off':>9} {len(latencies):>7} {rejected:>6} "
+                  f"{percentile(latencies, 50):>6.2f}s {percentile(latencies, 99):>6.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Distils the DistilBERT clarity scores into a logistic regression head on the
+MiniLM response embeddings, using the candidates stored in QueryHistory.
+Labels always come from re-running DistilBERT: the stored sentiment_score may
+have been written by the embedding head itself, so it is not a safe teacher.
+
+Usage:
+    python scripts/train_clarity_head.py [--output clarity_head.joblib]
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+from sqlmodel import Session, select
+
+import config
+from app.database import engine
+from app.models import QueryHistory
+from app.utils.embeddings import Embeddings
+from app.analysis.clarity import EmbeddingClarityScorer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def load_candidates():
+    """Yields the text of every unique candidate in the history table."""
+    seen = set()
+    with Session(engine) as session:
+        for record in session.exec(select(QueryHistory.all_candidates_json)):
+            try:
+                candidates = json.loads(record)
+            except (TypeError, ValueError):
+                continue
+            for candidate in candidates:
+                text = candidate.get("response", {}).get("text", "")
+                if text and text not in seen:
+                    seen.add(text)
+                    yield text
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the embedding clarity head from stored history.")
+    parser.add_argument("--output", default=config.CLARITY_HEAD_PATH, help="Where to write the trained head")
+    args = parser.parse_args()
+
+    texts = list(load_candidates())
+    if len(texts) < 2:
+        logger.error("Not enough stored candidates to train on")
+        sys.exit(1)
+    logger.info(f"Loaded {len(texts)} unique candidates from history")
+
+    from app.analysis.sentiment import SentimentAnalyzer
+    labels = [SentimentAnalyzer.clarity_score(text) for text in texts]
+
+    embeddings = np.array(Embeddings.get_sentence_embeddings(texts))
+    labels = np.array(labels, dtype=float)
+
+    head = EmbeddingClarityScorer.train(embeddings, labels)
+    predictions = head.predict_proba(embeddings)[:, 1]
+    logger.info(f"Mean absolute error vs DistilBERT: {np.mean(np.abs(predictions - labels)):.3f}")
+
+    joblib.dump(head, args.output)
+    logger.info(f"Saved clarity head to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# config.py exits at import without a token, so give the suite one before anything imports it
+os.environ.setdefault("AGGREGATOR_TOKEN", "test-aggregator-token")
@@ -0,0 +1,320 @@
+import os
+import sys
+import asyncio
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app import admission as admission_module
+from app.admission import AdmissionController, AdmissionRejected, AdmissionTicket
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def _assert_idle(controller):
+    assert controller.in_flight == 0
+    assert controller._queued == 0
+    assert all(not queues for queues in controller._queues.values())
+
+class Holder:
+    """Occupies one admission slot until released."""
+    def __init__(self, controller, client_key="holder"):
+        self.release = asyncio.Event()
+        self.task = asyncio.create_task(self._hold(controller, client_key))
+
+    async def _hold(self, controller, client_key):
+        async with controller.admit(AdmissionTicket(client_key)):
+            await self.release.wait()
+
+def _recording_request(controller, order, name, client_key, priority="interactive"):
+    async def run():
+        async with controller.admit(AdmissionTicket(client_key, priority)):
+            order.append(name)
+    return asyncio.create_task(run())
+
+def test_admits_immediately_below_limit():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, max_queue_wait=1, max_queue_size=10)
+        holders = [Holder(controller), Holder(controller)]
+        await _settle()
+        assert controller.in_flight == 2
+        assert controller._queued == 0
+
+        for holder in holders:
+            holder.release.set()
+        await asyncio.gather(*(holder.task for holder in holders))
+        _assert_idle(controller)
+        assert controller.admitted == 2
+
+    asyncio.run(scenario())
+
+def test_round_robin_across_clients_within_a_class():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=10)
+        holder = Holder(controller)
+        await _settle()
+
+        order = []
+        tasks = []
+        for name, client_key in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b"), ("c1", "c")]:
+            tasks.append(_recording_request(controller, order, name, client_key))
+            await _settle()
+        assert controller._queued == 5
+
+        holder.release.set()
+        await asyncio.gather(holder.task, *tasks)
+
+        assert order == ["a1", "b1", "c1", "a2", "a3"]
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_interactive_served_before_batch():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=10)
+        holder = Holder(controller)
+        await _settle()
+
+        order = []
+        batch = _recording_request(controller, order, "batch", "a", "batch")
+        await _settle()
+        interactive = _recording_request(controller, order, "interactive", "b", "interactive")
+        await _settle()
+
+        holder.release.set()
+        await asyncio.gather(holder.task, batch, interactive)
+
+        assert order == ["interactive", "batch"]
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_sheds_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=2)
+        holder = Holder(controller)
+        await _settle()
+        order = []
+        queued = [_recording_request(controller, order, f"q{i}", f"client-{i}") for i in range(2)]
+        await _settle()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(AdmissionTicket("late")):
+                pass
+
+        # No service time has been measured yet, so Retry-After falls back to the deadline
+        assert rejected.value.retry_after == 5
+        assert controller.rejected == 1
+        assert controller._queued == 2
+
+        holder.release.set()
+        await asyncio.gather(holder.task, *queued)
+        assert order == ["q0", "q1"]
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_sheds_when_estimated_wait_exceeds_deadline():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, max_queue_wait=10, max_queue_size=100)
+        controller._avg_service_time = 4.0
+        holders = [Holder(controller), Holder(controller)]
+        await _settle()
+
+        # Estimated wait is (ahead + 1) * 4 / 2, so five waiters fit within 10s and the sixth does not
+        order = []
+        queued = [_recording_request(controller, order, f"q{i}", f"client-{i}") for i in range(5)]
+        await _settle()
+        assert controller._queued == 5
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(AdmissionTicket("late")):
+                pass
+
+        assert rejected.value.retry_after == 12
+        assert controller._queued == 5
+
+        for holder in holders:
+            holder.release.set()
+        await asyncio.gather(*(holder.task for holder in holders), *queued)
+        assert len(order) == 5
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_batch_estimate_counts_interactive_waiters_ahead():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=10, max_queue_size=100)
+        controller._avg_service_time = 3.0
+        holder = Holder(controller)
+        await _settle()
+        order = []
+        queued = [
+            _recording_request(controller, order, "i0", "client-0"),
+            _recording_request(controller, order, "i1", "client-1"),
+            _recording_request(controller, order, "b0", "client-2", "batch"),
+        ]
+        await _settle()
+
+        assert controller._estimate_wait("interactive") == pytest.approx(9.0)
+        assert controller._estimate_wait("batch") == pytest.approx(12.0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(AdmissionTicket("client-3", "batch")):
+                pass
+        assert rejected.value.retry_after == 12
+        queued.append(_recording_request(controller, order, "i2", "client-4"))
+        await _settle()
+        assert controller._queued == 4
+
+        holder.release.set()
+        await asyncio.gather(holder.task, *queued)
+        assert order == ["i0", "i1", "i2", "b0"]
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_queue_deadline_rejects_waiter():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=0.05, max_queue_size=10)
+        holder = Holder(controller)
+        await _settle()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(AdmissionTicket("waiter")):
+                pass
+
+        assert rejected.value.retry_after == 1
+        assert controller.rejected == 1
+        assert controller._queued == 0
+        assert controller.in_flight == 1
+
+        holder.release.set()
+        await holder.task
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=10)
+        holder = Holder(controller)
+        await _settle()
+        order = []
+        cancelled = _recording_request(controller, order, "cancelled", "a")
+        kept = _recording_request(controller, order, "kept", "b")
+        await _settle()
+
+        cancelled.cancel()
+        await _settle()
+        assert controller._queued == 1
+
+        holder.release.set()
+        await asyncio.gather(holder.task, kept)
+        assert cancelled.cancelled()
+        assert order == ["kept"]
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_slot_granted_as_waiter_is_cancelled_is_not_leaked():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=10)
+        holder = Holder(controller)
+        await _settle()
+        order = []
+        racing = _recording_request(controller, order, "racing", "a")
+        following = _recording_request(controller, order, "following", "b")
+        await _settle()
+
+        # Hand the slot to "racing" and cancel it before it gets a chance to run
+        holder.release.set()
+        await holder.task
+        racing.cancel()
+        await asyncio.gather(racing, following, return_exceptions=True)
+
+        assert "following" in order
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+def test_slot_granted_as_waiter_times_out_is_passed_on(monkeypatch):
+    real_wait_for = asyncio.wait_for
+    calls = []
+
+    async def granted_then_timed_out(future, timeout):
+        calls.append(future)
+        if len(calls) > 1:
+            return await real_wait_for(future, timeout)
+        # Let the holder hand this waiter the slot, then report the deadline as passed
+        holder.release.set()
+        await future
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(admission_module.asyncio, "wait_for", granted_then_timed_out)
+
+    async def scenario():
+        nonlocal holder
+        controller = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=10)
+        holder = Holder(controller)
+        await _settle()
+        order = []
+
+        async def racing():
+            async with controller.admit(AdmissionTicket("a")):
+                order.append("racing")
+
+        racing_task = asyncio.create_task(racing())
+        await _settle()
+        following = _recording_request(controller, order, "following", "b")
+
+        results = await asyncio.gather(racing_task, following, holder.task, return_exceptions=True)
+
+        assert isinstance(results[0], AdmissionRejected)
+        assert order == ["following"]
+        _assert_idle(controller)
+
+    holder = None
+    asyncio.run(scenario())
+
+def test_service_time_is_smoothed():
+    controller = AdmissionController(max_in_flight=1, max_queue_wait=1, max_queue_size=1)
+    controller._record_service_time(10.0)
+    controller._record_service_time(0.0)
+    assert controller._avg_service_time == pytest.approx(8.0)
+
+def test_invalid_max_in_flight_exits_at_startup():
+    env = {**os.environ, "AGGREGATOR_TOKEN": "test-aggregator-token", "ADMISSION_MAX_IN_FLIGHT": "0"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import config"], cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode == 1
+    assert "ADMISSION_MAX_IN_FLIGHT" in result.stdout
+
+def _http_request(client_id=None):
+    from starlette.requests import Request
+    headers = [(b"x-client-id", client_id.encode())] if client_id else []
+    return Request({"type": "http", "method": "POST", "path": "/api/aggregate", "headers": headers, "client": ("203.0.113.7", 5000)})
+
+def test_client_key_ignores_self_reported_id_by_default(monkeypatch):
+    pytest.importorskip("fastapi")
+    import config
+    from app.main import resolve_client_key
+    monkeypatch.setattr(config, "ADMISSION_TRUST_CLIENT_ID", False)
+
+    assert resolve_client_key(_http_request("spoofed-1"), "spoofed-1") == "addr:203.0.113.7"
+    assert resolve_client_key(_http_request("spoofed-2"), "spoofed-2") == "addr:203.0.113.7"
+
+def test_client_key_uses_id_from_trusted_gateway(monkeypatch):
+    pytest.importorskip("fastapi")
+    import config
+    from app.main import resolve_client_key
+    monkeypatch.setattr(config, "ADMISSION_TRUST_CLIENT_ID", True)
+
+    assert resolve_client_key(_http_request("tenant-a"), "tenant-a") == "id:tenant-a"
+    assert resolve_client_key(_http_request(), None) == "addr:203.0.113.7"
@@ -0,0 +1,101 @@
+import os
+import sys
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+joblib = pytest.importorskip("joblib")
+
+import config
+from app.analysis.clarity import EmbeddingClarityScorer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def _training_data(count=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(count, dim))
+    # Teacher probability rises along the first embedding dimension
+    soft_labels = 1.0 / (1.0 + np.exp(-2.0 * embeddings[:, 0]))
+    return embeddings, soft_labels
+
+@pytest.fixture
+def trained_head(monkeypatch):
+    embeddings, soft_labels = _training_data()
+    head = EmbeddingClarityScorer.train(embeddings, soft_labels)
+    monkeypatch.setattr(EmbeddingClarityScorer, "_head", head)
+    return head
+
+def test_scores_are_probabilities_in_input_order(trained_head):
+    embeddings, _ = _training_data(count=20, seed=1)
+    rows = list(embeddings)
+
+    scores = EmbeddingClarityScorer.score_embeddings(rows)
+    reversed_scores = EmbeddingClarityScorer.score_embeddings(rows[::-1])
+
+    assert len(scores) == len(rows)
+    assert all(0.0 <= score <= 1.0 for score in scores)
+    assert scores == pytest.approx(list(trained_head.predict_proba(embeddings)[:, 1]))
+    assert reversed_scores == pytest.approx(scores[::-1])
+
+def test_head_learns_teacher_direction(trained_head):
+    low, high = np.zeros(16), np.zeros(16)
+    low[0], high[0] = -2.0, 2.0
+
+    low_score, high_score = EmbeddingClarityScorer.score_embeddings([low, high])
+
+    assert low_score < 0.5 < high_score
+
+def test_empty_input_does_not_load_head(monkeypatch):
+    monkeypatch.setattr(EmbeddingClarityScorer, "_head", None)
+    monkeypatch.setattr(config, "CLARITY_HEAD_PATH", "/nonexistent/clarity_head.joblib")
+
+    assert EmbeddingClarityScorer.score_embeddings([]) == []
+
+def test_load_raises_when_head_is_missing(monkeypatch, tmp_path):
+    monkeypatch.setattr(EmbeddingClarityScorer, "_head", None)
+    monkeypatch.setattr(config, "CLARITY_HEAD_PATH", str(tmp_path / "missing.joblib"))
+
+    with pytest.raises(FileNotFoundError, match="CLARITY_SCORER=sentiment"):
+        EmbeddingClarityScorer.load()
+
+def test_embedding_scorer_never_imports_sentiment(tmp_path):
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("wikipediaapi")
+
+    head_path = tmp_path / "clarity_head.joblib"
+    joblib.dump(EmbeddingClarityScorer.train(*_training_data()), head_path)
+
+    # A fresh interpreter, so modules imported by other tests cannot mask an import
+    script = (
+        "import sys\n"
+        "from app.analysis.evaluator import Evaluator\n"
+        "evaluator = Evaluator()\n"
+        "assert evaluator.sentiment_analyzer is None\n"
+        "assert evaluator.clarity_scorer._head is not None\n"
+        "print('app.analysis.sentiment' in sys.modules)\n"
+    )
+    env = {
+        **os.environ,
+        "AGGREGATOR_TOKEN": "test-aggregator-token",
+        "CLARITY_SCORER": "embedding",
+        "CLARITY_HEAD_PATH": str(head_path),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "False"
+
+def test_unknown_clarity_scorer_exits_at_startup():
+    env = {**os.environ, "AGGREGATOR_TOKEN": "test-aggregator-token", "CLARITY_SCORER": "embeddings"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import config"], cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode == 1
+    assert "CLARITY_SCORER" in result.stdout
@@ -0,0 +1,145 @@
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionTicket
+from app.coalescing import SingleFlight, ClientDisconnected, cancel_on_disconnect, normalize_prompt
+
+POLL_INTERVAL = 0.01
+
+class FakeClient:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+class FakeFanOut:
+    """Stands in for the provider fan-out and records whether it was cancelled."""
+    def __init__(self):
+        self.started = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.started += 1
+        try:
+            await self.release.wait()
+            return {"winner": "shared"}
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+def _request(single_flight, fan_out, client, prompt="What is the capital of France?"):
+    return asyncio.create_task(cancel_on_disconnect(
+        single_flight.do(normalize_prompt(prompt), fan_out),
+        client.is_disconnected,
+        POLL_INTERVAL
+    ))
+
+def test_identical_prompts_share_one_fan_out():
+    async def scenario():
+        single_flight, fan_out = SingleFlight(), FakeFanOut()
+        requests = [
+            _request(single_flight, fan_out, FakeClient(), prompt)
+            for prompt in ("What is  X?", "what is x?", " WHAT IS X? ")
+        ]
+        await asyncio.sleep(POLL_INTERVAL)
+        fan_out.release.set()
+
+        assert await asyncio.gather(*requests) == [{"winner": "shared"}] * 3
+        assert fan_out.started == 1
+        assert (single_flight.leaders, single_flight.coalesced) == (1, 2)
+
+    asyncio.run(scenario())
+
+def test_fan_out_cancelled_when_every_client_disconnects():
+    async def scenario():
+        single_flight, fan_out = SingleFlight(), FakeFanOut()
+        clients = [FakeClient() for _ in range(3)]
+        requests = [_request(single_flight, fan_out, client) for client in clients]
+        await asyncio.sleep(POLL_INTERVAL)
+
+        for client in clients[:2]:
+            client.disconnected = True
+        await asyncio.sleep(5 * POLL_INTERVAL)
+        assert not fan_out.cancelled
+
+        clients[2].disconnected = True
+        results = await asyncio.gather(*requests, return_exceptions=True)
+
+        assert all(isinstance(result, ClientDisconnected) for result in results)
+        assert fan_out.cancelled
+        assert single_flight.abandoned == 1
+
+    asyncio.run(scenario())
+
+def test_remaining_clients_get_result_after_others_disconnect():
+    async def scenario():
+        single_flight, fan_out = SingleFlight(), FakeFanOut()
+        leaving, staying = FakeClient(), FakeClient()
+        requests = [_request(single_flight, fan_out, leaving), _request(single_flight, fan_out, staying)]
+        await asyncio.sleep(POLL_INTERVAL)
+
+        leaving.disconnected = True
+        await asyncio.sleep(5 * POLL_INTERVAL)
+        fan_out.release.set()
+        results = await asyncio.gather(*requests, return_exceptions=True)
+
+        assert isinstance(results[0], ClientDisconnected)
+        assert results[1] == {"winner": "shared"}
+        assert not fan_out.cancelled
+        assert single_flight.abandoned == 0
+
+    asyncio.run(scenario())
+
+def test_interactive_follower_promotes_queued_batch_call():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue_wait=5, max_queue_size=10)
+        single_flight = SingleFlight()
+        order = []
+        release_blocker = asyncio.Event()
+
+        async def blocker():
+            async with admission.admit(AdmissionTicket("blocker", "interactive")):
+                await release_blocker.wait()
+
+        async def run(name, ticket):
+            async with admission.admit(ticket):
+                order.append(name)
+                return name
+
+        blocking = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        other_batch = asyncio.create_task(run("other batch", AdmissionTicket("client-a", "batch")))
+        await asyncio.sleep(0)
+
+        leader_ticket = AdmissionTicket("client-b", "batch")
+        leader = asyncio.create_task(single_flight.do("prompt", lambda: run("shared", leader_ticket), context=leader_ticket))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(single_flight.do(
+            "prompt",
+            lambda: run("unused", AdmissionTicket("client-c", "interactive")),
+            on_join=lambda ticket: admission.promote(ticket, "interactive")
+        ))
+        await asyncio.sleep(0)
+        assert leader_ticket.priority == "interactive"
+
+        release_blocker.set()
+        assert await asyncio.gather(leader, follower, other_batch, blocking) == ["shared", "shared", "other batch", None]
+        assert order == ["shared", "other batch"]
+
+    asyncio.run(scenario())
+
+def test_promote_never_lowers_priority():
+    ticket = AdmissionTicket("client", "interactive")
+    AdmissionController(max_in_flight=1, max_queue_wait=1, max_queue_size=1).promote(ticket, "batch")
+    assert ticket.priority == "interactive"
+
+def test_unknown_priority_rejected():
+    with pytest.raises(ValueError):
+        AdmissionTicket("client", "urgent")
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+
+from sqlalchemy import create_engine, select
+from sqlmodel import SQLModel
+
+from app import history_io
+
+ROW_COUNT = 250
+BATCH_SIZE = 100
+
+def _make_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+def _read_rows(engine):
+    with engine.connect() as conn:
+        table = history_io.history_table
+        return [dict(row) for row in conn.execute(select(table).order_by(table.c.id)).mappings()]
+
+@pytest.fixture
+def source_engine(tmp_path):
+    engine = _make_engine(tmp_path / "source.db")
+    start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    rows = [
+        {
+            "timestamp": start + timedelta(minutes=i),
+            "prompt": f"Question {i} with unicode é中",
+            "winning_provider": "Groq (Llama 3)",
+            "winning_text": f"Answer {i}",
+            "final_score": i / ROW_COUNT,
+            "evidence_score": 0.5,
+            "consensus_score": 0.25,
+            "sentiment_score": 0.75,
+            "evidence_snippets_json": json.dumps([f"snippet {i}"]),
+            "all_candidates_json": json.dumps([{"candidate_id": i, "text": "x" * 1000}]),
+        }
+        for i in range(ROW_COUNT)
+    ]
+    with engine.begin() as conn:
+        conn.execute(history_io.history_table.insert(), rows)
+    return engine
+
+def _round_trip(monkeypatch, tmp_path, source_engine, stream, filename, keep_ids):
+    monkeypatch.setattr(history_io, "engine", source_engine)
+    dump_path = tmp_path / filename
+    with open(dump_path, "wb") as f:
+        for chunk in stream(BATCH_SIZE):
+            f.write(chunk)
+
+    target_engine = _make_engine(tmp_path / "target.db")
+    monkeypatch.setattr(history_io, "engine", target_engine)
+    imported = history_io.import_dump(str(dump_path), batch_size=BATCH_SIZE, keep_ids=keep_ids)
+
+    assert imported == ROW_COUNT
+    return _read_rows(source_engine), _read_rows(target_engine)
+
+def test_ndjson_round_trip(monkeypatch, tmp_path, source_engine):
+    source_rows, target_rows = _round_trip(
+        monkeypatch, tmp_path, source_engine, history_io.stream_ndjson_gzip, "history.ndjson.gz", keep_ids=False
+    )
+    strip_id = lambda rows: [{k: v for k, v in row.items() if k != "id"} for row in rows]
+    assert strip_id(target_rows) == strip_id(source_rows)
+
+def test_parquet_round_trip(monkeypatch, tmp_path, source_engine):
+    pytest.importorskip("pyarrow")
+    source_rows, target_rows = _round_trip(
+        monkeypatch, tmp_path, source_engine, history_io.stream_parquet, "history.parquet", keep_ids=True
+    )
+    assert target_rows == source_rows
+
+def test_export_of_empty_table(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    monkeypatch.setattr(history_io, "engine", _make_engine(tmp_path / "empty.db"))
+    dump_path = tmp_path / "empty.parquet"
+    dump_path.write_bytes(b"".join(history_io.stream_parquet(BATCH_SIZE)))
+
+    assert pq.read_table(dump_path).num_rows == 0
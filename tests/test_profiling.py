@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+import config
+from app.profiling import StackSampler, ProfilerBusy, PROFILE_ID_PATTERN, save_profile, get_profile_path
+
+PROFILING_TOKEN = "test-profiling-token"
+
+def _busy_worker(stop_event):
+    while not stop_event.is_set():
+        sum(range(1000))
+
+def _sample_worker_thread():
+    stop_event = threading.Event()
+    worker = threading.Thread(target=_busy_worker, args=(stop_event,), name="busy-worker")
+    worker.start()
+    try:
+        with StackSampler(interval=0.001) as sampler:
+            time.sleep(0.2)
+    finally:
+        stop_event.set()
+        worker.join()
+    return sampler
+
+def test_sampler_records_worker_thread_in_folded_format():
+    sampler = _sample_worker_thread()
+
+    lines = sampler.folded().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+    worker_stacks = [line for line in lines if line.startswith("busy-worker;")]
+    assert worker_stacks
+    assert any("_busy_worker (test_profiling.py:" in line for line in worker_stacks)
+    assert not any(line.startswith("stack-sampler;") for line in lines)
+
+def test_only_one_sampler_runs_at_a_time():
+    with StackSampler(interval=0.01):
+        with pytest.raises(ProfilerBusy):
+            StackSampler(interval=0.01).start()
+
+    # The lock is released on stop, so the next profile can run
+    with StackSampler(interval=0.01):
+        pass
+
+def test_saved_profile_round_trips_by_id(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    sampler = _sample_worker_thread()
+
+    profile_id = save_profile(sampler, "worker")
+
+    assert PROFILE_ID_PATTERN.match(profile_id)
+    path = get_profile_path(profile_id)
+    assert path == os.path.join(str(tmp_path), profile_id)
+    with open(path) as f:
+        assert f.read() == sampler.folded()
+
+@pytest.mark.parametrize("profile_id", [
+    "../x",
+    "../worker-20240101T000000-1.folded",
+    "worker-20240101T000000-1.folded/../../x",
+    "/etc/passwd",
+    "worker-20240101T000000-1.txt",
+])
+def test_profile_path_rejects_ids_outside_the_pattern(monkeypatch, tmp_path, profile_id):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+
+    assert get_profile_path(profile_id) is None
+
+def test_profile_path_is_none_for_unknown_profile(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+
+    assert get_profile_path("worker-20240101T000000-1.folded") is None
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from app import main
+    from app.admission import AdmissionController
+
+    monkeypatch.setattr(config, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(config, "PROFILING_TOKEN", PROFILING_TOKEN)
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        main.app.state,
+        "admission",
+        AdmissionController(max_in_flight=1, max_queue_wait=1, max_queue_size=1),
+        raising=False
+    )
+    # Not used as a context manager, so the lifespan (database and model loading) never runs
+    return TestClient(main.app)
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+def test_debug_endpoints_are_hidden_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_ENABLED", False)
+
+    assert client.post("/api/debug/profile?seconds=0.1", headers=_bearer(PROFILING_TOKEN)).status_code == 404
+    assert client.get("/api/debug/profiles/worker-20240101T000000-1.folded", headers=_bearer(PROFILING_TOKEN)).status_code == 404
+
+@pytest.mark.parametrize("headers", [{}, _bearer(config.AGGREGATOR_TOKEN), _bearer("wrong"), {"Authorization": PROFILING_TOKEN}])
+def test_debug_endpoints_require_profiling_token(client, headers):
+    assert client.post("/api/debug/profile?seconds=0.1", headers=headers).status_code == 401
+    assert client.get("/api/debug/profiles/worker-20240101T000000-1.folded", headers=headers).status_code == 401
+
+def test_worker_profile_can_be_downloaded(client):
+    response = client.post("/api/debug/profile?seconds=0.1", headers=_bearer(PROFILING_TOKEN))
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    download = client.get(f"/api/debug/profiles/{profile_id}", headers=_bearer(PROFILING_TOKEN))
+    assert download.status_code == 200
+    assert download.text == response.text
+
+    assert client.get("/api/debug/profiles/..%2Fx", headers=_bearer(PROFILING_TOKEN)).status_code == 404
+
+def test_worker_profile_conflicts_with_running_profile(client):
+    with StackSampler(interval=0.01):
+        response = client.post("/api/debug/profile?seconds=0.1", headers=_bearer(PROFILING_TOKEN))
+
+    assert response.status_code == 409
+
+def test_aggregate_rejects_wrong_profile_token(client):
+    response = client.post(
+        "/api/aggregate",
+        json={"prompt": "What is the capital of France?"},
+        headers={**_bearer(config.AGGREGATOR_TOKEN), "X-Profile": config.AGGREGATOR_TOKEN}
+    )
+
+    assert response.status_code == 401
+
+def test_aggregate_profile_conflicts_with_running_profile(client):
+    with StackSampler(interval=0.01):
+        response = client.post(
+            "/api/aggregate",
+            json={"prompt": "What is the capital of France?"},
+            headers={**_bearer(config.AGGREGATOR_TOKEN), "X-Profile": PROFILING_TOKEN}
+        )
+
+    assert response.status_code == 409